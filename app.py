@@ -1,18 +1,29 @@
+import asyncio
+import itertools
 import zipfile
-from flask import Flask, request, jsonify, render_template, send_from_directory
-from bson.json_util import dumps
+import orjson
+from quart import Quart, request, render_template, send_from_directory
 import os
 import shutil
 from config import users_collection
-from utils import is_aadhar_card
-from utils import extract_text
+from utils import classify_images
+from utils import detect_fields_batch
+from utils import extract_text_from_boxes
+from utils import build_uid_index
 from utils import calculate_match_score
+import threading
 import uuid
 import ntpath
 
 import cv2
+import numpy as np
 
-app = Flask(__name__)
+app = Quart(__name__)
+
+# Flask imposed no request-body limit; Quart defaults to 16 MiB and a
+# 60 s body timeout, both far too small for multi-hundred-scan ZIPs
+app.config["MAX_CONTENT_LENGTH"] = None
+app.config["BODY_TIMEOUT"] = None
 
 # Set up static folder structure
 UPLOAD_FOLDER = "/tmp/uploads"  # Use /tmp for Vercel serverless functions
@@ -23,6 +34,23 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(STATIC_FOLDER, exist_ok=True)
 os.makedirs(TEMPLATE_FOLDER, exist_ok=True)
 
+IMAGE_SUFFIXES = (".jpg", ".png", ".jpeg")
+
+# Images decoded and held in memory at once while processing a batch
+PROCESS_CHUNK_SIZE = 16
+
+# Only the fields the API serializes; excluding _id means no ObjectId
+# ever has to be converted for JSON
+RESULT_PROJECTION = {
+    "_id": 0, "name": 1, "uid": 1, "address": 1, "filename": 1,
+    "is_aadhaar": 1, "name_score": 1, "address_score": 1,
+    "uid_score": 1, "overall_score": 1, "batch_id": 1,
+}
+
+def j(obj, status=200):
+    """JSON response serialized with orjson instead of stdlib json"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype="application/json")
+
 # Copy HTML files to templates folder if they don't exist yet
 def setup_template_files():
     html_files = ["index.html", "upload.html", "analytics.html"]
@@ -36,16 +64,32 @@ setup_template_files()
 
 def clean_uploads_folder():
     try:
-        for item in os.listdir(UPLOAD_FOLDER):
+        items = os.listdir(UPLOAD_FOLDER)
+        trash_path = os.path.join(UPLOAD_FOLDER, f".trash-{uuid.uuid4()}")
+        os.makedirs(trash_path)
+
+        staged = False
+        for item in items:
             item_path = os.path.join(UPLOAD_FOLDER, item)
-            
+
             if item == "last_batch.txt":
                 continue
-                
+
             if os.path.isdir(item_path):
-                shutil.rmtree(item_path)
-                print(f"Removed directory: {item_path}")
-                
+                # O(1) metadata rename; the recursive delete of the whole
+                # trash dir happens in the background thread below
+                os.replace(item_path, os.path.join(trash_path, item))
+                staged = True
+                print(f"Staged directory for removal: {item_path}")
+
+        if staged:
+            # ignore_errors: a restaged leftover .trash dir may vanish
+            # under a still-running delete thread from an earlier upload
+            threading.Thread(target=shutil.rmtree, args=(trash_path,),
+                             kwargs={"ignore_errors": True}, daemon=True).start()
+        else:
+            os.rmdir(trash_path)
+
         print("Uploads folder cleaned successfully")
     except Exception as e:
         print(f"Error cleaning uploads folder: {str(e)}")
@@ -54,33 +98,47 @@ def get_filename(file_path):
     """Extract filename from path"""
     return ntpath.basename(file_path)
 
+def save_upload(file_storage, target_path):
+    """Write an uploaded file to disk using large-buffer I/O"""
+    with open(target_path, "wb", buffering=1 << 20) as dst:
+        shutil.copyfileobj(file_storage.stream, dst, length=1 << 20)
+
+@app.before_serving
+async def ensure_indexes():
+    try:
+        # Make /results batch queries an index walk instead of a scan
+        await users_collection.create_index([("batch_id", 1), ("uid", 1)])
+    except Exception as e:
+        print(f"Failed to create index: {str(e)}")
+
 # Routes for serving HTML pages
 @app.route("/")
-def index():
-    return render_template("index.html")
+async def index():
+    return await render_template("index.html")
 
 @app.route("/upload.html")
-def upload_page():
-    return render_template("upload.html")
+async def upload_page():
+    return await render_template("upload.html")
 
 @app.route("/analytics.html")
-def analytics_page():
-    return render_template("analytics.html")
+async def analytics_page():
+    return await render_template("analytics.html")
 
 # API Endpoints
 @app.route("/api/upload", methods=["POST"])
-def upload_files():
-    if "zip_file" not in request.files or "excel_file" not in request.files:
-        return jsonify({"error": "ZIP file and Excel file are required"}), 400
-    
+async def upload_files():
+    files = await request.files
+    if "zip_file" not in files or "excel_file" not in files:
+        return j({"error": "ZIP file and Excel file are required"}, 400)
+
     # Clear the database before processing a new upload
-    users_collection.delete_many({})
-    print("Database cleared before new upload")    
+    await users_collection.delete_many({})
+    print("Database cleared before new upload")
 
-    clean_uploads_folder()
-    
-    zip_file = request.files["zip_file"]
-    excel_file = request.files["excel_file"]
+    await asyncio.to_thread(clean_uploads_folder)
+
+    zip_file = files["zip_file"]
+    excel_file = files["excel_file"]
 
     batch_id = str(uuid.uuid4())
     
@@ -90,52 +148,102 @@ def upload_files():
     zip_path = os.path.join(batch_folder, zip_file.filename)
     excel_path = os.path.join(batch_folder, excel_file.filename)
 
-    zip_file.save(zip_path)
-    excel_file.save(excel_path)
+    # Save with 1 MiB chunks instead of werkzeug's 16 KiB default to cut
+    # syscall overhead on multi-MB uploads; run off the event loop
+    await asyncio.to_thread(save_upload, zip_file, zip_path)
+    await asyncio.to_thread(save_upload, excel_file, excel_path)
 
     with open(os.path.join(UPLOAD_FOLDER, "last_batch.txt"), "w") as f:
         f.write(batch_id)
 
-    return jsonify({
+    return j({
         "message": "Files uploaded successfully", 
         "zip_path": zip_path, 
         "excel_path": excel_path,
         "batch_id": batch_id
     })
 
+# Per-job progress queues feeding the SSE endpoint; finished jobs are
+# evicted after this many seconds if no client ever drains the stream
+_progress_queues = {}
+PROGRESS_JOB_TTL = 600
+
 @app.route("/api/process", methods=["POST"])
-def process_data():
+async def process_data():
+    data = await request.get_json()
+    zip_path = data.get("zip_path")
+    excel_path = data.get("excel_path")
+
+    if not zip_path or not excel_path:
+        return j({"error": "Missing zip_path or excel_path"}, 400)
+
+    path_parts = zip_path.split(os.sep)
+    if len(path_parts) >= 2:
+        batch_id = path_parts[-2]
+    else:
+        return j({"error": "Invalid file path format"}, 400)
+
+    # Processing runs as a background task; per-image progress and the
+    # final results stream over /api/progress/<job_id> instead of one
+    # response that holds the connection open for the whole batch
+    job_id = str(uuid.uuid4())
+    _progress_queues[job_id] = asyncio.Queue()
+    app.add_background_task(_run_job, job_id, zip_path, excel_path, batch_id)
+
+    return j({
+        "message": "Processing started",
+        "job_id": job_id,
+        "batch_id": batch_id
+    })
+
+@app.route("/api/progress/<job_id>", methods=["GET"])
+async def get_progress(job_id):
+    queue = _progress_queues.get(job_id)
+    if queue is None:
+        return j({"error": "Unknown job"}, 404)
+
+    async def event_stream():
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                yield b"data: " + orjson.dumps(message) + b"\n\n"
+        finally:
+            _progress_queues.pop(job_id, None)
+
+    response = app.response_class(event_stream(), mimetype="text/event-stream")
+    # Quart cancels responses after RESPONSE_TIMEOUT (60s default), which
+    # would kill the stream mid-batch; this stream lives as long as the job
+    response.timeout = None
+    return response
+
+async def _run_job(job_id, zip_path, excel_path, batch_id):
+    queue = _progress_queues[job_id]
     try:
-        data = request.json
-        zip_path = data.get("zip_path")
-        excel_path = data.get("excel_path")
-        
-        if not zip_path or not excel_path:
-            return jsonify({"error": "Missing zip_path or excel_path"}), 400
-            
-        path_parts = zip_path.split(os.sep)
-        if len(path_parts) >= 2:
-            batch_id = path_parts[-2]
-        else:
-            return jsonify({"error": "Invalid file path format"}), 400
+        total = await asyncio.to_thread(count_zip_images, zip_path)
+        await queue.put({"type": "start", "total": total, "batch_id": batch_id})
 
-        extracted_images = extract_zip(zip_path, os.path.join(UPLOAD_FOLDER, batch_id))
+        # Parse the Excel sheet once per batch instead of once per image
+        uid_index = await asyncio.to_thread(build_uid_index, excel_path)
 
         results = []
         bulk_insert = []
         non_aadhaar_files = []
 
-        for image in extracted_images:
-            filename = get_filename(image)
-            
-            if is_aadhar_card(image):
+        async def process_one_image(name, image, is_aadhaar, detection):
+            """Per-image OCR + scoring stage; images in a chunk run concurrently"""
+            filename = get_filename(name)
+
+            if is_aadhaar:
                 # Process Aadhaar card
-                cropped_data = extract_text(image)
-                
+                boxes = detection.boxes.data.tolist() if detection is not None else []
+                cropped_data = await asyncio.to_thread(extract_text_from_boxes, image, boxes)
+
                 # Calculate match scores (name, address, uid, overall)
-                match_scores = calculate_match_score(cropped_data, excel_path)
-                
-                user_record = {
+                match_scores = calculate_match_score(cropped_data, uid_index)
+
+                record = {
                     "name": cropped_data.get("name", ""),
                     "uid": cropped_data.get("uid", ""),
                     "address": cropped_data.get("address", ""),
@@ -147,12 +255,9 @@ def process_data():
                     "overall_score": match_scores.get("overall_score", 0),
                     "batch_id": batch_id,
                 }
-
-                bulk_insert.append(user_record)
-                results.append({**user_record})
             else:
                 # Handle non-Aadhaar files
-                non_aadhaar_record = {
+                record = {
                     "name": "NA",
                     "uid": "NA",
                     "address": "NA",
@@ -164,21 +269,59 @@ def process_data():
                     "overall_score": 0,
                     "batch_id": batch_id,
                 }
-                
-                bulk_insert.append(non_aadhaar_record)
-                results.append({**non_aadhaar_record})
-                non_aadhaar_files.append(filename)
 
-        if bulk_insert:
-            inserted_ids = users_collection.insert_many(bulk_insert).inserted_ids
-            print(f"Inserted {len(inserted_ids)} records into MongoDB for batch {batch_id}.")
-
-        for record in results:
-            if "_id" in record:
-                record["_id"] = str(record["_id"])
+            await queue.put({
+                "type": "progress",
+                "filename": filename,
+                "is_aadhaar": record["is_aadhaar"],
+            })
+            return record
+
+        # Decode and process the archive a bounded chunk at a time so
+        # memory stays flat no matter how large the upload is
+        image_iter = iter_zip_images(zip_path)
+        while True:
+            chunk = await asyncio.to_thread(_next_chunk, image_iter)
+            if not chunk:
+                break
+            names = [name for name, image in chunk]
+            images = [image for name, image in chunk]
+
+            # One batched forward for classification, then one for
+            # detection, instead of per-image model calls; inference
+            # stays off the event loop
+            is_aadhaar_flags = await asyncio.to_thread(classify_images, images)
+            aadhaar_indices = [i for i, flag in enumerate(is_aadhaar_flags) if flag]
+            detections = await asyncio.to_thread(
+                detect_fields_batch, [images[i] for i in aadhaar_indices]) if aadhaar_indices else []
+            detections_by_index = dict(zip(aadhaar_indices, detections or []))
+
+            # Fan the independent per-image pipelines out across the
+            # thread pool instead of processing one image at a time
+            records = await asyncio.gather(*[
+                process_one_image(name, images[index], is_aadhaar_flags[index], detections_by_index.get(index))
+                for index, name in enumerate(names)])
+
+            for record in records:
+                bulk_insert.append(record)
+                results.append({**record})
+                if not record["is_aadhaar"]:
+                    non_aadhaar_files.append(record["filename"])
 
-        return jsonify({
-            "message": "Processing complete", 
+        if bulk_insert:
+            # Unordered inserts let the server write the batch in parallel
+            # instead of serially aborting on the first error; large
+            # batches go out as concurrent 1000-doc chunks
+            chunks = [bulk_insert[i:i + 1000] for i in range(0, len(bulk_insert), 1000)]
+            insert_results = await asyncio.gather(*[
+                users_collection.insert_many(chunk, ordered=False, bypass_document_validation=True)
+                for chunk in chunks])
+            inserted_count = sum(len(r.inserted_ids) for r in insert_results)
+            print(f"Inserted {inserted_count} records into MongoDB for batch {batch_id}.")
+
+        await queue.put({
+            "type": "complete",
+            "message": "Processing complete",
             "results": results,
             "aadhaar_count": len(results) - len(non_aadhaar_files),
             "non_aadhaar_count": len(non_aadhaar_files),
@@ -187,39 +330,59 @@ def process_data():
         })
 
     except Exception as e:
-        print(f"Error in process_data: {str(e)}")
-        return jsonify({"error": "Internal Server Error", "details": str(e)}), 500
+        print(f"Error in _run_job: {str(e)}")
+        await queue.put({"type": "error", "error": "Internal Server Error", "details": str(e)})
+    finally:
+        # Sentinel closes the SSE stream
+        await queue.put(None)
+        # If the client never connects (crashed between /process and the
+        # EventSource open) the stream's own cleanup never runs, so drop
+        # the queue after a grace period rather than leaking the results
+        asyncio.get_running_loop().call_later(
+            PROGRESS_JOB_TTL, _progress_queues.pop, job_id, None)
+
+def iter_zip_images(zip_path):
+    """Stream image entries from the ZIP, decoded in memory"""
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        # Walk the central directory once; directories and non-image
+        # entries are skipped without touching their data at all
+        for info in zip_ref.infolist():
+            if info.is_dir() or not info.filename.lower().endswith(IMAGE_SUFFIXES):
+                continue
+            image = cv2.imdecode(np.frombuffer(zip_ref.read(info), np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                print(f"Failed to decode image: {info.filename}")
+                continue
+            yield info.filename, image
 
-def extract_zip(zip_path, output_folder):
-    extracted_files = []
+def count_zip_images(zip_path):
+    """Count image entries without decompressing anything"""
     with zipfile.ZipFile(zip_path, "r") as zip_ref:
-        zip_ref.extractall(output_folder)
-        for file_name in zip_ref.namelist():
-            if file_name.lower().endswith((".jpg", ".png", ".jpeg")):
-                extracted_files.append(os.path.join(output_folder, file_name))
-    return extracted_files
+        return sum(1 for info in zip_ref.infolist()
+                   if not info.is_dir() and info.filename.lower().endswith(IMAGE_SUFFIXES))
+
+def _next_chunk(image_iter, limit=None):
+    """Pull up to limit decoded images off the archive iterator"""
+    if limit is None:
+        limit = PROCESS_CHUNK_SIZE
+    return list(itertools.islice(image_iter, limit))
 
 @app.route("/api/results", methods=["GET"])
-def get_results():
+async def get_results():
     try:
         last_batch_path = os.path.join(UPLOAD_FOLDER, "last_batch.txt")
         if os.path.exists(last_batch_path):
             with open(last_batch_path, "r") as f:
                 batch_id = f.read().strip()
-                
-            users = list(users_collection.find({"batch_id": batch_id}))
-            
-            # Convert ObjectId to string for JSON serialization
-            for user in users:
-                if "_id" in user:
-                    user["_id"] = str(user["_id"])
-            
+
+            users = await users_collection.find({"batch_id": batch_id}, RESULT_PROJECTION).to_list(length=None)
+
             # Count statistics
             aadhaar_count = sum(1 for user in users if user.get("is_aadhaar", False))
             non_aadhaar_count = sum(1 for user in users if not user.get("is_aadhaar", True))
             non_aadhaar_files = [user.get("filename") for user in users if not user.get("is_aadhaar", True)]
             
-            return jsonify({
+            return j({
                 "results": users, 
                 "batch_id": batch_id,
                 "aadhaar_count": aadhaar_count,
@@ -228,25 +391,20 @@ def get_results():
                 "total_count": len(users)
             })
         else:
-            return jsonify({"error": "No recent batch found"}), 404
+            return j({"error": "No recent batch found"}, 404)
     except Exception as e:
-        return jsonify({"error": f"Error retrieving results: {str(e)}"}), 500
+        return j({"error": f"Error retrieving results: {str(e)}"}, 500)
 
 @app.route("/api/results/<batch_id>", methods=["GET"])
-def get_results_by_batch(batch_id):
-    users = list(users_collection.find({"batch_id": batch_id}))
-    
-    # Convert ObjectId to string for JSON serialization
-    for user in users:
-        if "_id" in user:
-            user["_id"] = str(user["_id"])
-    
+async def get_results_by_batch(batch_id):
+    users = await users_collection.find({"batch_id": batch_id}, RESULT_PROJECTION).to_list(length=None)
+
     # Count statistics
     aadhaar_count = sum(1 for user in users if user.get("is_aadhaar", False))
     non_aadhaar_count = sum(1 for user in users if not user.get("is_aadhaar", True))
     non_aadhaar_files = [user.get("filename") for user in users if not user.get("is_aadhaar", True)]
     
-    return jsonify({
+    return j({
         "results": users, 
         "batch_id": batch_id,
         "aadhaar_count": aadhaar_count,
@@ -256,20 +414,15 @@ def get_results_by_batch(batch_id):
     })
 
 @app.route("/api/batches", methods=["GET"])
-def get_batches():
-    batches = users_collection.distinct("batch_id")
-    return jsonify(batches)
+async def get_batches():
+    batches = await users_collection.distinct("batch_id")
+    return j(batches)
 
 @app.route("/api/all-results", methods=["GET"])
-def get_all_results():
-    users = list(users_collection.find({}))
-    
-    # Convert ObjectId to string for JSON serialization
-    for user in users:
-        if "_id" in user:
-            user["_id"] = str(user["_id"])
-            
-    return jsonify(users)
+async def get_all_results():
+    users = await users_collection.find({}, RESULT_PROJECTION).to_list(length=None)
+
+    return j(users)
  
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,35 @@
+"""Export the YOLO checkpoints to ONNX for faster inference.
+
+Run once after (re)training:
+
+    python export_models.py
+
+The graphs are exported with a dynamic batch axis so the chunked multi-
+image forwards in utils.py keep working; on CPU-only machines the
+weights are additionally quantized to INT8 when onnxruntime's
+quantization tooling is installed. utils.py prefers the exported
+best.onnx next to each best.pt when it exists; delete the .onnx files to
+fall back to the PyTorch checkpoints.
+"""
+import torch
+from ultralytics import YOLO
+
+from utils import CLASSIFICATION_MODEL_PATH, DETECTION_MODEL_PATH
+
+def export_model(model_path, imgsz):
+    model = YOLO(model_path)
+    exported = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+    print(f"Exported {model_path} -> {exported}")
+
+    if not torch.cuda.is_available():
+        # INT8 weights let CPU inference use VNNI dot products
+        try:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(exported, exported, weight_type=QuantType.QInt8)
+            print(f"Quantized {exported} to INT8")
+        except ImportError:
+            print("onnxruntime quantization not available, keeping FP32 export")
+
+if __name__ == "__main__":
+    export_model(CLASSIFICATION_MODEL_PATH, 224)
+    export_model(DETECTION_MODEL_PATH, 640)
@@ -0,0 +1,237 @@
+"""Pure string-matching helpers for Aadhaar verification.
+
+Kept free of pandas/model imports so the whole module can be compiled
+with Cython (cythonize -i matching.py) unchanged if the matching loop
+ever becomes hot again; the inner similarity kernels already run in
+RapidFuzz's C++ implementation.
+"""
+import re
+import string
+from rapidfuzz.fuzz import ratio as _fuzz_ratio
+from rapidfuzz.fuzz import token_set_ratio as _token_set_ratio
+
+# Common address terms to ignore
+ADDRESS_TERMS_TO_IGNORE = [
+    "road", "street", "lane", "marg", "nagar", "colony", "township", 
+    "apartment", "flat", "sector", "block", "phase", "district", "area",
+    "near", "behind", "opposite", "beside", "next to", "across from"
+]
+
+# Precompiled once; the normalize helpers run per Excel row and per image
+_PUNCT_TABLE = str.maketrans('', '', string.punctuation)
+_WS_RE = re.compile(r'\s+')
+_PIN_RE = re.compile(r'\d{6}')
+_IGNORE_SET = frozenset(ADDRESS_TERMS_TO_IGNORE)
+
+def similarity_ratio(a, b):
+    """0-100 similarity between two strings (RapidFuzz, C++ backed)"""
+    if not a or not b:
+        return 0.0
+    return _fuzz_ratio(a, b)
+
+def normalize_text(text):
+    """Normalize text by removing punctuation, extra spaces, and converting to lowercase"""
+    if not text:
+        return ""
+    # Remove punctuation
+    text = text.translate(_PUNCT_TABLE)
+    # Convert to lowercase
+    text = text.lower()
+    # Replace multiple spaces with single space
+    text = _WS_RE.sub(' ', text).strip()
+    return text
+
+def name_match(input_name, extracted_name):
+    """
+    Implement the name matching logic based on the rules:
+    1. Exact letter match
+    2. Abbreviated names
+    3. Ignoring middle names
+    4. Matching any part of the name
+    5. Circular matching
+    6. Single-letter abbreviation
+    """
+    if not input_name or not extracted_name:
+        return False, 0
+    
+    # Normalize names
+    input_name = normalize_text(input_name)
+    extracted_name = normalize_text(extracted_name)
+    
+    # Rule 1: Exact match
+    if input_name == extracted_name:
+        return True, 100
+    
+    # Split names into parts; sets make the membership rules O(1) lookups
+    input_parts = input_name.split()
+    extracted_parts = extracted_name.split()
+    input_set = frozenset(input_parts)
+    extracted_set = frozenset(extracted_parts)
+    
+    # Rule 2 & 6: Abbreviated names and single-letter abbreviation
+    def check_abbreviation(parts1, parts2):
+        if len(parts1) != len(parts2):
+            return False
+        
+        for i, (p1, p2) in enumerate(zip(parts1, parts2)):
+            # Check if one part is an abbreviation of the other
+            if len(p1) == 1 and p2.startswith(p1):
+                continue
+            elif len(p2) == 1 and p1.startswith(p2):
+                continue
+            elif p1 != p2:
+                return False
+        return True
+    
+    if check_abbreviation(input_parts, extracted_parts) or check_abbreviation(extracted_parts, input_parts):
+        return True, 95
+    
+    # Rule 3: Ignoring middle names
+    def check_without_middle(parts1, parts2):
+        if len(parts1) < 2 or len(parts2) < 2:
+            return False
+        
+        # Check if first and last names match
+        return parts1[0] == parts2[0] and parts1[-1] == parts2[-1]
+    
+    if (len(input_parts) > 2 and check_without_middle(input_parts, extracted_parts)) or \
+       (len(extracted_parts) > 2 and check_without_middle(extracted_parts, input_parts)):
+        return True, 90
+    
+    # Rule 4: Matching any part of the name
+    if len(input_parts) == 1 and input_parts[0] in extracted_set:
+        return True, 85
+    if len(extracted_parts) == 1 and extracted_parts[0] in input_set:
+        return True, 85
+
+    # Rule 5: Circular matching (all parts present but in different order)
+    if input_set == extracted_set and len(input_parts) == len(extracted_parts):
+        return True, 90
+
+    # Check if one name is a subset of the other
+    if input_set <= extracted_set:
+        return True, 80
+    if extracted_set <= input_set:
+        return True, 80
+    
+    # Calculate partial similarity for non-matches
+    similarity = similarity_ratio(input_name, extracted_name)
+    if similarity >= 70:
+        return True, similarity
+        
+    return False, similarity
+
+def uid_match(db_uid, extracted_uid):
+    """
+    Calculate UID match score
+    Returns match result (boolean) and score (0-100)
+    """
+    if not db_uid or not extracted_uid:
+        return False, 0
+    
+    # Normalize UIDs by removing spaces
+    db_uid = db_uid.replace(" ", "")
+    extracted_uid = extracted_uid.replace(" ", "")
+    
+    # Exact match
+    if db_uid == extracted_uid:
+        return True, 100
+    
+    # Calculate similarity for partial matches
+    similarity = similarity_ratio(db_uid, extracted_uid)
+    
+    # High similarity threshold for UIDs
+    if similarity >= 90:
+        return True, similarity
+    
+    return False, similarity
+
+def extract_pincode(address):
+    """Extract 6-digit pincode from an address string"""
+    if not address:
+        return ""
+    
+    # Look for 6 consecutive digits
+    pincode_match = _PIN_RE.search(address.replace(" ", ""))
+    if pincode_match:
+        return pincode_match.group(0)
+    return ""
+
+def normalize_address(address):
+    """Normalize address by removing common terms, punctuation, etc."""
+    if not address:
+        return ""
+    
+    # Convert to lowercase
+    address = address.lower()
+    
+    # Remove punctuation
+    address = address.translate(_PUNCT_TABLE)
+
+    # Replace multiple spaces with single space
+    address = _WS_RE.sub(' ', address).strip()
+
+    # Remove common address terms
+    words = address.split()
+    filtered_words = [word for word in words if word not in _IGNORE_SET]
+    
+    return ' '.join(filtered_words)
+
+def address_match(input_address, extracted_address):
+    """
+    Implement the address matching logic:
+    1. Normalization
+    2. Pincode matching
+    3. Field-specific matching
+    4. Final address match score
+    """
+    if not input_address or not extracted_address:
+        return False, 0
+    
+    # Extract pincodes
+    input_pincode = extract_pincode(input_address)
+    extracted_pincode = extract_pincode(extracted_address)
+    
+    # Pincode matching (100 if match, 0 if not)
+    pincode_score = 100 if input_pincode and extracted_pincode and input_pincode == extracted_pincode else 0
+
+    # Normalize addresses
+    norm_input = normalize_address(input_address)
+    norm_extracted = normalize_address(extracted_address)
+
+    # Split addresses into parts for field-specific matching
+    input_parts = norm_input.split()
+    extracted_set = frozenset(norm_extracted.split())
+
+    # Check if significant parts of input address are in extracted address
+    parts_score = 0
+    significant_parts = frozenset(part for part in input_parts if len(part) > 3)  # Consider words longer than 3 chars as significant
+
+    if significant_parts:
+        matches = len(significant_parts & extracted_set)
+        parts_score = (matches / len(significant_parts)) * 100
+
+    # Fast paths that skip the similarity computation entirely: with no
+    # pincode and no significant parts the score can never reach the
+    # threshold, while a matching pincode plus strong part overlap is
+    # already a confident match (parts_score stands in for similarity)
+    if pincode_score == 0 and not significant_parts:
+        return False, 0
+    if pincode_score == 100 and parts_score >= 75:
+        final_score = (0.4 * pincode_score) + (0.4 * parts_score) + (0.2 * parts_score)
+        return True, final_score
+
+    # Compare as bags of tokens rather than one long string diff —
+    # addresses routinely list the same fields in a different order
+    similarity_score = _token_set_ratio(norm_input, norm_extracted)
+
+    # Calculate final address score with weighting
+    if pincode_score > 0:
+        # If pincode matches, give it high weight
+        final_score = (0.4 * pincode_score) + (0.4 * similarity_score) + (0.2 * parts_score)
+    else:
+        # If no pincode or pincode mismatch, rely more on content matching
+        final_score = (0.6 * similarity_score) + (0.4 * parts_score)
+    
+    # Return match result and score
+    return final_score >= 70, final_score
@@ -347,7 +347,7 @@ function updateTables(data) {
                 </div>
             </td>
             <td>
-                <button class="btn btn-sm btn-primary view-details" data-id="${item._id}">
+                <button class="btn btn-sm btn-primary view-details" data-index="${index}">
                     <i class="fas fa-eye"></i>
                 </button>
             </td>
@@ -356,11 +356,11 @@ function updateTables(data) {
         tableBody.appendChild(row);
     });
     
-    // Set up event listeners for view details buttons
+    // Set up event listeners for view details buttons; rows are keyed by
+    // their index in the sorted results (the API no longer returns _id)
     document.querySelectorAll('.view-details').forEach(button => {
         button.addEventListener('click', function() {
-            const userId = this.getAttribute('data-id');
-            const userDetails = aadhaarResults.find(user => user._id === userId);
+            const userDetails = aadhaarResults[parseInt(this.getAttribute('data-index'), 10)];
             if (userDetails) {
                 showUserDetailsModal(userDetails);
             }
@@ -108,13 +108,9 @@ function processFiles(uploadData) {
         return response.json();
     })
     .then(data => {
-        // Update progress UI - Step 2 & 3: Completed
-        document.getElementById('progressBar').style.width = '75%';
-        document.getElementById('step2Status').innerHTML = '<span class="badge bg-success">Completed</span>';
-        document.getElementById('step3Status').innerHTML = '<span class="badge bg-success">Completed</span>';
-        
-        // Generate Report
-        generateReport(data, uploadData.batch_id);
+        // Processing now runs in the background; follow its progress
+        // over the server-sent events stream
+        streamProgress(data.job_id, uploadData);
     })
     .catch(error => {
         console.error('Error:', error);
@@ -123,6 +119,47 @@ function processFiles(uploadData) {
     });
 }
 
+function streamProgress(jobId, uploadData) {
+    const source = new EventSource(`/api/progress/${jobId}`);
+    let total = 0;
+    let processed = 0;
+
+    source.onmessage = function(event) {
+        const msg = JSON.parse(event.data);
+
+        if (msg.type === 'start') {
+            total = msg.total;
+        } else if (msg.type === 'progress') {
+            processed++;
+            if (total > 0) {
+                // Step 2/3 spans 50% -> 75% of the progress bar
+                const percent = 50 + Math.round((processed / total) * 25);
+                document.getElementById('progressBar').style.width = percent + '%';
+            }
+        } else if (msg.type === 'complete') {
+            source.close();
+
+            // Update progress UI - Step 2 & 3: Completed
+            document.getElementById('progressBar').style.width = '75%';
+            document.getElementById('step2Status').innerHTML = '<span class="badge bg-success">Completed</span>';
+            document.getElementById('step3Status').innerHTML = '<span class="badge bg-success">Completed</span>';
+
+            // Generate Report
+            generateReport(msg, uploadData.batch_id);
+        } else if (msg.type === 'error') {
+            source.close();
+            document.getElementById('step2Status').innerHTML = '<span class="badge bg-danger">Failed</span>';
+            alert('Processing failed: ' + (msg.details || msg.error));
+        }
+    };
+
+    source.onerror = function() {
+        source.close();
+        document.getElementById('step2Status').innerHTML = '<span class="badge bg-danger">Failed</span>';
+        alert('Processing failed: lost connection to the progress stream');
+    };
+}
+
 function generateReport(processData, batchId) {
     // Update progress UI - Step 4: Generating Report
     document.getElementById('progressBar').style.width = '100%';
@@ -1,13 +1,15 @@
 import pandas as pd
 import easyocr
+import numpy as np
 import cv2
 from ultralytics import YOLO
 import os
-import re
-import string
-from difflib import SequenceMatcher
+import threading
 import urllib.request
 
+from matching import name_match, uid_match, address_match
+from matching import normalize_text, normalize_address, extract_pincode, similarity_ratio
+
 # Get the directory of the current script
 current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -19,213 +21,116 @@ DETECTION_MODEL_PATH = os.path.join(current_dir, "Detection_model", "best.pt")
 _classifier = None
 _detector = None
 _reader = None
+_reader_lock = threading.Lock()
+
+def _model_path(pt_path):
+    """Prefer an exported ONNX model (see export_models.py) when present"""
+    onnx_path = os.path.splitext(pt_path)[0] + ".onnx"
+    return onnx_path if os.path.exists(onnx_path) else pt_path
 
 def get_classifier():
     global _classifier
     if _classifier is None:
-        _classifier = YOLO(CLASSIFICATION_MODEL_PATH)
+        _classifier = YOLO(_model_path(CLASSIFICATION_MODEL_PATH))
     return _classifier
 
 def get_detector():
     global _detector
     if _detector is None:
-        _detector = YOLO(DETECTION_MODEL_PATH)
+        _detector = YOLO(_model_path(DETECTION_MODEL_PATH))
     return _detector
 
 def get_reader():
     global _reader
     if _reader is None:
-        _reader = easyocr.Reader(['en'])
+        # extract_text_from_boxes runs on many threads at once, so guard
+        # initialization or each worker builds its own reader
+        with _reader_lock:
+            if _reader is None:
+                reader = easyocr.Reader(['en'], cudnn_benchmark=True)
+                # Warm up on a dummy batch so cuDNN benchmarks its kernels for
+                # the fixed OCR input shape before the first real request
+                dummy_batch = [np.zeros((64, 320, 3), dtype=np.uint8)] * 3
+                reader.readtext_batched(dummy_batch, n_width=320, n_height=64, batch_size=len(dummy_batch))
+                _reader = reader
     return _reader
 
-# Common address terms to ignore
-ADDRESS_TERMS_TO_IGNORE = [
-    "road", "street", "lane", "marg", "nagar", "colony", "township", 
-    "apartment", "flat", "sector", "block", "phase", "district", "area",
-    "near", "behind", "opposite", "beside", "next to", "across from"
-]
+def classify_images(images, batch=16):
+    """Run the Aadhaar classifier over already-decoded images in batched
+    forwards of `batch` images.
 
-def is_aadhar_card(image_path):
+    Returns a list of booleans aligned with images. Raises on model
+    failure rather than defaulting the batch to non-Aadhaar — a broken
+    model should surface as a job error, not a clean all-rejected report."""
+    classifier = get_classifier()
+    flags = []
+    # ultralytics treats a list of arrays as a single batch no matter
+    # what the batch kwarg says, so chunk the list manually
+    for start in range(0, len(images), batch):
+        results = classifier(images[start:start + batch], imgsz=224)
+        flags.extend(float(result.probs.data[0]) >= 0.8 for result in results)
+    return flags
+
+def detect_fields_batch(images, batch=16):
+    """Run the field detector over already-decoded images in batched
+    forwards of `batch` images."""
     try:
-        classifier = get_classifier()
-        results = classifier(image_path)
-        for result in results:
-            probs = result.probs
-            aadhar = float(probs.data[0])
-            if aadhar >= 0.8:
-                return True
-        return False
+        detector = get_detector()
+        results = []
+        for start in range(0, len(images), batch):
+            results.extend(detector(images[start:start + batch], imgsz=640))
+        return results
     except Exception as e:
-        print(f"Error in is_aadhar_card: {str(e)}")
-        return False
-
-def detect_fields(image_path):
-    if is_aadhar_card(image_path):
-        try:
-            detector = get_detector()
-            results = detector(image_path)
-            return results
-        except Exception as e:
-            print(f"Error in detect_fields: {str(e)}")
-            return None
-    else:
+        print(f"Error in detect_fields_batch: {str(e)}")
         return None
 
-def extract_text(image_path):
+def extract_text_from_boxes(image, boxes):
+    """Run OCR over pre-computed field boxes on an already-loaded image."""
     try:
-        image = cv2.imread(image_path)
-        if image is None:
-            print(f"Failed to read image: {image_path}")
-            return {"name": "", "uid": "", "address": ""}
-            
-        results = detect_fields(image_path)
-
-        if results is None or len(results) == 0:
-            print(f"No fields detected in image: {image_path}")
-            return {"name": "", "uid": "", "address": ""}
-            
         extracted_data = {"name": "", "uid": "", "address": ""}
-        
-        for result in results[0].boxes.data.tolist():
+
+        detector = get_detector()
+        field_classes = []
+        rois = []
+
+        for result in boxes:
             x1, y1, x2, y2, confidence, class_id = map(int, result[:6])
-            detector = get_detector()
             field_class = detector.names[class_id]
 
             cropped_roi = image[y1:y2, x1:x2]
             if cropped_roi.size == 0:
-                print(f"Empty ROI for {field_class} in {image_path}")
+                print(f"Empty ROI for {field_class}")
                 continue
 
             gray_roi = cv2.cvtColor(cropped_roi, cv2.COLOR_BGR2GRAY)
-            
-            reader = get_reader()
-            text = reader.readtext(gray_roi, detail=0)
+
+            # Downscale to a fixed 64px height with the width rounded up
+            # to a multiple of 32, so every OCR batch hits the same
+            # tensor shapes and cuDNN can reuse its benchmarked kernels
+            width = max(32, (gray_roi.shape[1] * 64) // gray_roi.shape[0])
+            width = ((width + 31) // 32) * 32
+            gray_roi = cv2.resize(gray_roi, (width, 64), interpolation=cv2.INTER_AREA)
+
+            field_classes.append(field_class)
+            rois.append(gray_roi)
+
+        if not rois:
+            return extracted_data
+
+        # Run OCR on all field ROIs as one batch instead of one readtext
+        # call per field, amortizing model launch overhead
+        reader = get_reader()
+        batch_results = reader.readtext_batched(rois, n_width=320, n_height=64, batch_size=len(rois))
+        for field_class, detections in zip(field_classes, batch_results):
+            text = [detection[1] for detection in detections]
             if text:
-                extracted_data[field_class] = ' '.join(text)  
+                extracted_data[field_class] = ' '.join(text)
 
         return extracted_data
     except Exception as e:
-        print(f"Error in extract_text: {str(e)}")
+        print(f"Error in extract_text_from_boxes: {str(e)}")
         return {"name": "", "uid": "", "address": ""}
 
-def normalize_text(text):
-    """Normalize text by removing punctuation, extra spaces, and converting to lowercase"""
-    if not text:
-        return ""
-    # Remove punctuation
-    text = text.translate(str.maketrans('', '', string.punctuation))
-    # Convert to lowercase
-    text = text.lower()
-    # Replace multiple spaces with single space
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-def name_match(input_name, extracted_name):
-    """
-    Implement the name matching logic based on the rules:
-    1. Exact letter match
-    2. Abbreviated names
-    3. Ignoring middle names
-    4. Matching any part of the name
-    5. Circular matching
-    6. Single-letter abbreviation
-    """
-    if not input_name or not extracted_name:
-        return False, 0
-    
-    # Normalize names
-    input_name = normalize_text(input_name)
-    extracted_name = normalize_text(extracted_name)
-    
-    # Rule 1: Exact match
-    if input_name == extracted_name:
-        return True, 100
-    
-    # Split names into parts
-    input_parts = input_name.split()
-    extracted_parts = extracted_name.split()
-    
-    # Rule 2 & 6: Abbreviated names and single-letter abbreviation
-    def check_abbreviation(parts1, parts2):
-        if len(parts1) != len(parts2):
-            return False
-        
-        for i, (p1, p2) in enumerate(zip(parts1, parts2)):
-            # Check if one part is an abbreviation of the other
-            if len(p1) == 1 and p2.startswith(p1):
-                continue
-            elif len(p2) == 1 and p1.startswith(p2):
-                continue
-            elif p1 != p2:
-                return False
-        return True
-    
-    if check_abbreviation(input_parts, extracted_parts) or check_abbreviation(extracted_parts, input_parts):
-        return True, 95
-    
-    # Rule 3: Ignoring middle names
-    def check_without_middle(parts1, parts2):
-        if len(parts1) < 2 or len(parts2) < 2:
-            return False
-        
-        # Check if first and last names match
-        return parts1[0] == parts2[0] and parts1[-1] == parts2[-1]
-    
-    if (len(input_parts) > 2 and check_without_middle(input_parts, extracted_parts)) or \
-       (len(extracted_parts) > 2 and check_without_middle(extracted_parts, input_parts)):
-        return True, 90
-    
-    # Rule 4: Matching any part of the name
-    if len(input_parts) == 1 and input_parts[0] in extracted_parts:
-        return True, 85
-    if len(extracted_parts) == 1 and extracted_parts[0] in input_parts:
-        return True, 85
-    
-    # Rule 5: Circular matching (all parts present but in different order)
-    if sorted(input_parts) == sorted(extracted_parts):
-        return True, 90
-    
-    # Check if one name is a subset of the other
-    all_input_in_extracted = all(part in extracted_parts for part in input_parts)
-    all_extracted_in_input = all(part in input_parts for part in extracted_parts)
-    
-    if all_input_in_extracted:
-        return True, 80
-    if all_extracted_in_input:
-        return True, 80
-    
-    # Calculate partial similarity for non-matches
-    similarity = SequenceMatcher(None, input_name, extracted_name).ratio() * 100
-    if similarity >= 70:
-        return True, similarity
-        
-    return False, similarity
-
-def uid_match(db_uid, extracted_uid):
-    """
-    Calculate UID match score
-    Returns match result (boolean) and score (0-100)
-    """
-    if not db_uid or not extracted_uid:
-        return False, 0
-    
-    # Normalize UIDs by removing spaces
-    db_uid = db_uid.replace(" ", "")
-    extracted_uid = extracted_uid.replace(" ", "")
-    
-    # Exact match
-    if db_uid == extracted_uid:
-        return True, 100
-    
-    # Calculate similarity for partial matches
-    similarity = SequenceMatcher(None, db_uid, extracted_uid).ratio() * 100
-    
-    # High similarity threshold for UIDs
-    if similarity >= 90:
-        return True, similarity
-    
-    return False, similarity
-
 def construct_address_from_excel(row):
     """Construct address string from the excel row with multiple address fields"""
     address_parts = []
@@ -272,86 +177,43 @@ def construct_address_from_excel(row):
     
     return ", ".join(address_parts)
 
-def extract_pincode(address):
-    """Extract 6-digit pincode from an address string"""
-    if not address:
-        return ""
-    
-    # Look for 6 consecutive digits
-    pincode_match = re.search(r'(\d{6})', address.replace(" ", ""))
-    if pincode_match:
-        return pincode_match.group(1)
-    return ""
-
-def normalize_address(address):
-    """Normalize address by removing common terms, punctuation, etc."""
-    if not address:
-        return ""
-    
-    # Convert to lowercase
-    address = address.lower()
-    
-    # Remove punctuation
-    address = address.translate(str.maketrans('', '', string.punctuation))
-    
-    # Replace multiple spaces with single space
-    address = re.sub(r'\s+', ' ', address).strip()
-    
-    # Remove common address terms
-    words = address.split()
-    filtered_words = [word for word in words if word.lower() not in ADDRESS_TERMS_TO_IGNORE]
-    
-    return ' '.join(filtered_words)
-
-def address_match(input_address, extracted_address):
+def build_uid_index(excel_file):
     """
-    Implement the address matching logic:
-    1. Normalization
-    2. Pincode matching
-    3. Field-specific matching
-    4. Final address match score
+    Read the Excel sheet once and index it by normalized UID.
+    Maps space-stripped UID -> (name, constructed address)
     """
-    if not input_address or not extracted_address:
-        return False, 0
-    
-    # Extract pincodes
-    input_pincode = extract_pincode(input_address)
-    extracted_pincode = extract_pincode(extracted_address)
-    
-    # Pincode matching (100 if match, 0 if not)
-    pincode_score = 100 if input_pincode and extracted_pincode and input_pincode == extracted_pincode else 0
-    
-    # Normalize addresses
-    norm_input = normalize_address(input_address)
-    norm_extracted = normalize_address(extracted_address)
-    
-    # Calculate overall string similarity
-    similarity_score = SequenceMatcher(None, norm_input, norm_extracted).ratio() * 100
-    
-    # Split addresses into parts for field-specific matching
-    input_parts = norm_input.split()
-    extracted_parts = norm_extracted.split()
-    
-    # Check if significant parts of input address are in extracted address
-    parts_score = 0
-    significant_parts = [part for part in input_parts if len(part) > 3]  # Consider words longer than 3 chars as significant
-    
-    if significant_parts:
-        matches = sum(1 for part in significant_parts if part in extracted_parts)
-        parts_score = (matches / len(significant_parts)) * 100
-    
-    # Calculate final address score with weighting
-    if pincode_score > 0:
-        # If pincode matches, give it high weight
-        final_score = (0.4 * pincode_score) + (0.4 * similarity_score) + (0.2 * parts_score)
-    else:
-        # If no pincode or pincode mismatch, rely more on content matching
-        final_score = (0.6 * similarity_score) + (0.4 * parts_score)
-    
-    # Return match result and score
-    return final_score >= 70, final_score
+    uid_index = {}
+    try:
+        if not os.path.exists(excel_file):
+            print(f"Excel file not found: {excel_file}")
+            return uid_index
+
+        # Prefer the Rust-based calamine reader when available; fall back
+        # to the default openpyxl engine otherwise
+        try:
+            df = pd.read_excel(excel_file, dtype={"UID": str}, engine="calamine")
+        except (ImportError, ValueError):
+            df = pd.read_excel(excel_file, dtype={"UID": str})
+
+        # Check for required columns (based on your actual Excel structure)
+        required_columns = ["Name", "UID"]
+        if not all(col in df.columns for col in required_columns):
+            print(f"Excel file is missing required columns. Available columns: {df.columns.tolist()}")
+            return uid_index
+
+        # Normalize the whole UID column in one vectorized C pass, then
+        # build the index from plain dicts instead of iterrows, which
+        # materializes a Series per row
+        uid_norm = df["UID"].astype("string").str.replace(" ", "", regex=False)
+        for db_uid, row in zip(uid_norm, df.to_dict("records")):
+            uid_index[str(db_uid)] = (row["Name"], construct_address_from_excel(row))
+
+        return uid_index
+    except Exception as e:
+        print(f"Error in build_uid_index: {str(e)}")
+        return uid_index
 
-def calculate_match_score(extracted_data, excel_file):
+def calculate_match_score(extracted_data, uid_index):
     """
     Calculate match scores for all fields and return a dictionary of scores
     """
@@ -363,57 +225,60 @@ def calculate_match_score(extracted_data, excel_file):
             "uid_score": 0,
             "overall_score": 0
         }
-        
+
         if not all(key in extracted_data for key in ["name", "uid", "address"]):
             print("Missing required fields in extracted data")
             return match_scores
-            
-        if not os.path.exists(excel_file):
-            print(f"Excel file not found: {excel_file}")
-            return match_scores
-            
-        df = pd.read_excel(excel_file)
-        
-        # Check for required columns (based on your actual Excel structure)
-        required_columns = ["Name", "UID"]
-        if not all(col in df.columns for col in required_columns):
-            print(f"Excel file is missing required columns. Available columns: {df.columns.tolist()}")
+
+        if not uid_index:
+            print("UID index is empty")
             return match_scores
-            
+
         if not extracted_data["uid"]:
             print("Extracted UID is empty")
             return match_scores
-        
+
         # Normalize UID by removing spaces for comparison
         extracted_uid = extracted_data["uid"].replace(" ", "")
-            
+
+        # Exact UID hit is the common case: one O(1) dict lookup instead
+        # of scanning every record
+        hit = uid_index.get(extracted_uid)
+        if hit is not None:
+            db_name, db_address = hit
+            name_matched, name_score = name_match(db_name, extracted_data["name"])
+            addr_matched, addr_score = address_match(db_address, extracted_data["address"])
+            overall_score = (0.4 * 100) + (0.4 * name_score) + (0.2 * addr_score)
+            return {
+                "name_score": round(name_score, 1),
+                "address_score": round(addr_score, 1),
+                "uid_score": 100.0,
+                "overall_score": round(overall_score, 1)
+            }
+
         best_match_scores = match_scores.copy()
         best_match_found = False
-            
-        for index, row in df.iterrows():
-            db_uid = str(row["UID"]).replace(" ", "")
-            
+
+        # Fall back to the fuzzy scan only when OCR mangled the UID
+        for db_uid, (db_name, db_address) in uid_index.items():
             # Calculate UID match score
             uid_matched, uid_score = uid_match(db_uid, extracted_uid)
-            
+
             # If UID doesn't match at all, skip to next record
-            if uid_score < 80: 
+            if uid_score < 80:
                 continue
-                
-            # Construct full address from multiple fields in Excel
-            db_address = construct_address_from_excel(row)
-            
+
             # Apply name and address matching logic
-            name_matched, name_score = name_match(row["Name"], extracted_data["name"])
+            name_matched, name_score = name_match(db_name, extracted_data["name"])
             addr_matched, addr_score = address_match(db_address, extracted_data["address"])
-        
+
             # Give higher weight to UID and name matches since they're more reliable
             overall_score = (0.4 * uid_score) + (0.4 * name_score) + (0.2 * addr_score)
-            
+
             # Log the match details
             print(f"Match results for UID {extracted_uid}:")
             print(f"  DB UID: '{db_uid}' vs Extracted: '{extracted_uid}' (Score: {uid_score:.1f})")
-            print(f"  DB Name: '{row['Name']}' vs Extracted: '{extracted_data['name']}' (Score: {name_score:.1f})")
+            print(f"  DB Name: '{db_name}' vs Extracted: '{extracted_data['name']}' (Score: {name_score:.1f})")
             print(f"  DB Address: '{db_address}'")
             print(f"  Extracted Address: '{extracted_data['address']}' (Score: {addr_score:.1f})")
             print(f"  Overall score: {overall_score:.1f}")